@@ -1,26 +1,126 @@
 # backend.py
 import os
-import requests
-from fastapi import FastAPI, File, UploadFile, HTTPException, Form
-from fastapi.responses import StreamingResponse
+import logging
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, File, UploadFile, HTTPException, Form, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
+from pydantic import BaseModel
 
 from services import (
     get_musical_description_from_openai,
     generate_audio_from_replicate,
+    stream_audio_from_url,
+    start_music_job,
+    complete_music_job,
+    get_music_job,
+    init_http_client,
+    close_http_client,
+    init_redis_client,
+    close_redis_client,
+    warm_up_upstream_clients,
+    close_upstream_clients,
+    init_logging,
+    close_logging,
+    MAX_IMAGE_BYTES,
 )
 
+log = logging.getLogger("synthesia")
+
 # Get API keys 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 REPLICATE_API_TOKEN = os.getenv("REPLICATE_API_TOKEN")
 
 if not OPENAI_API_KEY:
-    print("Warning: OPENAI_API_KEY environment variable not set.")
+    log.warning("OPENAI_API_KEY environment variable not set.")
 if not REPLICATE_API_TOKEN:
-    print("Warning: REPLICATE_API_TOKEN environment variable not set.")
+    log.warning("REPLICATE_API_TOKEN environment variable not set.")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    init_logging()
+    await init_http_client()
+    await init_redis_client()
+    await warm_up_upstream_clients()
+    yield
+    await close_redis_client()
+    await close_upstream_clients()
+    await close_http_client()
+    close_logging()
+
 
 # Initialize FastAPI App
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+
+# --- Upload size limit ---
+# FastAPI parses (and spools to disk) the whole multipart body before the endpoint
+# runs, so oversized uploads have to be rejected here, from the request itself.
+
+class _BodyTooLarge(Exception):
+    pass
+
+
+class UploadSizeLimitMiddleware:
+    """Rejects request bodies over max_bytes on the given paths with 413.
+
+    A declared Content-Length is checked before any body is read; bodies without
+    one are counted as they stream in and cut off once they pass the limit.
+    """
+
+    def __init__(self, app, max_bytes: int, paths: set[str], detail: str):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.paths = paths
+        self.detail = detail
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        too_large = JSONResponse(status_code=413, content={"detail": self.detail})
+        content_length = dict(scope["headers"]).get(b"content-length", b"")
+        if content_length.isdigit() and int(content_length) > self.max_bytes:
+            await too_large(scope, receive, send)
+            return
+
+        received = 0
+        over_limit = False
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received, over_limit
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    over_limit = True
+                    raise _BodyTooLarge()
+            return message
+
+        async def limited_send(message):
+            nonlocal response_started
+            # FastAPI turns body-parsing errors into a 400; replace it with the 413.
+            if over_limit and not response_started:
+                return
+            response_started = response_started or message["type"] == "http.response.start"
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, limited_send)
+        except _BodyTooLarge:
+            pass
+        if over_limit and not response_started:
+            await too_large(scope, receive, send)
+
+
+# Allow for the multipart boundaries and part headers around the image itself.
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    max_bytes=MAX_IMAGE_BYTES + 64 * 1024,
+    paths={"/describe-image-musically"},
+    detail=f"Image too large. Maximum size is {MAX_IMAGE_BYTES} bytes.",
+)
 
 # --- CORS Middleware ---
 origins = [
@@ -32,14 +132,35 @@ app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
     allow_credentials=True,
-    allow_methods=["*"], 
-    allow_headers=["*"], 
+    allow_methods=["GET", "POST", "OPTIONS"],
+    allow_headers=["Content-Type"],
+    max_age=86400,  # Let browsers cache preflight responses for a day
 )
 
 
+# Response models (declared so FastAPI serializes responses directly via Pydantic)
+
+class DescriptionResponse(BaseModel):
+    description: str
+
+class AudioResponse(BaseModel):
+    audio_url: str
+
+class AudioJobStartedResponse(BaseModel):
+    job_id: str
+
+class AudioJobResponse(BaseModel):
+    status: str
+    audio_url: str | None = None
+    error: str | None = None
+
+class WebhookAckResponse(BaseModel):
+    status: str
+
+
 # Endpoints 
 
-@app.post("/describe-image-musically")
+@app.post("/describe-image-musically", response_model=DescriptionResponse)
 async def describe_image_musically_endpoint(image: UploadFile = File(...)):
     """
     Endpoint to get a musical description for an uploaded image.
@@ -50,10 +171,10 @@ async def describe_image_musically_endpoint(image: UploadFile = File(...)):
     except HTTPException as e:
         raise e
     except Exception as e:
-        print(f"Unexpected error in /describe-image-musically endpoint: {e}")
+        log.exception("Unexpected error in /describe-image-musically endpoint")
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {e}")
 
-@app.post("/generate-audio")
+@app.post("/generate-audio", response_model=AudioResponse)
 async def generate_audio_endpoint(prompt: str = Form(...)):
     """
     Endpoint to generate audio from a text prompt.
@@ -65,7 +186,75 @@ async def generate_audio_endpoint(prompt: str = Form(...)):
     except HTTPException as e:
         raise e
     except Exception as e:
-        print(f"Unexpected error in /generate-audio endpoint: {e}")
+        log.exception("Unexpected error in /generate-audio endpoint")
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred while generating audio: {e}")
 
+@app.post("/generate-audio-stream")
+async def generate_audio_stream_endpoint(prompt: str = Form(...)):
+    """
+    Endpoint to generate audio from a text prompt and stream it back.
+    """
+    try:
+        audio_url = await generate_audio_from_replicate(prompt)
+        audio_stream = await stream_audio_from_url(audio_url)
+        return StreamingResponse(
+            audio_stream,
+            media_type="audio/wav",
+            headers={
+                "Cache-Control": "no-store",
+                # Stop nginx-style reverse proxies from buffering the whole file.
+                "X-Accel-Buffering": "no",
+                "Content-Disposition": "inline",
+            },
+        )
+
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        log.exception("Unexpected error in /generate-audio-stream endpoint")
+        raise HTTPException(status_code=500, detail=f"An unexpected error occurred while streaming audio: {e}")
+
+@app.post("/generate-audio/jobs", status_code=202, response_model=AudioJobStartedResponse)
+async def start_audio_job_endpoint(prompt: str = Form(...)):
+    """
+    Endpoint to start generating audio from a text prompt without waiting for it.
+    Poll /generate-audio/jobs/{job_id} for the result.
+    """
+    try:
+        job_id = await start_music_job(prompt)
+        return {"job_id": job_id}
+
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        log.exception("Unexpected error in /generate-audio/jobs endpoint")
+        raise HTTPException(status_code=500, detail=f"An unexpected error occurred while starting audio generation: {e}")
+
+@app.get("/generate-audio/jobs/{job_id}", response_model=AudioJobResponse, response_model_exclude_none=True)
+async def get_audio_job_endpoint(job_id: str):
+    """
+    Endpoint to get the status of an audio generation job.
+    """
+    return await get_music_job(job_id)
+
+@app.post("/replicate-webhook", response_model=WebhookAckResponse)
+async def replicate_webhook_endpoint(request: Request):
+    """
+    Endpoint Replicate calls when a music job's prediction completes.
+    """
+    await complete_music_job(dict(request.headers), await request.body())
+    return {"status": "ok"}
+
+
+if __name__ == "__main__":
+    import uvicorn
 
+    uvicorn.run(
+        "backend:app",
+        host="0.0.0.0",
+        port=8000,
+        loop="uvloop",
+        http="httptools",
+        workers=int(os.getenv("WEB_CONCURRENCY", 4)),
+        log_level="warning",
+    )
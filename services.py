@@ -1,128 +1,583 @@
 import os
+import asyncio
+import functools
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+from collections.abc import AsyncIterator
 import replicate
 import base64
-from openai import OpenAI
+import hashlib
+import json
+import uuid
+import filetype
+import httpx
+import openai
+import tenacity
+import redis.asyncio as redis
+from openai import AsyncOpenAI
+from replicate.client import _build_httpx_client
+from replicate.webhook import WebhookSigningSecret
 from fastapi import HTTPException, UploadFile
-import requests
 from dotenv import load_dotenv
 
 load_dotenv() # Load env variables
 
+
+log = logging.getLogger("synthesia")
+_log_listener: QueueListener | None = None
+
+
+def init_logging() -> None:
+    """Routes synthesia log records through a queue drained by a background thread.
+
+    Only the "synthesia" logger is configured (level from LOG_LEVEL), so library
+    loggers such as httpx keep their default WARNING threshold.
+    """
+    global _log_listener
+    log_queue = queue.SimpleQueue()
+    queue_handler = QueueHandler(log_queue)
+    # Formatting happens on the listener thread; only merge args/tracebacks here.
+    queue_handler.setFormatter(logging.Formatter("%(message)s"))
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    log.handlers = [queue_handler]
+    log.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    log.propagate = False
+    _log_listener = QueueListener(log_queue, stream_handler)
+    _log_listener.start()
+
+
+def close_logging() -> None:
+    """Flushes queued log records and stops the listener thread."""
+    global _log_listener
+    if _log_listener is not None:
+        _log_listener.stop()
+        _log_listener = None
+    log.handlers = []
+    log.propagate = True
+
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 REPLICATE_API_TOKEN = os.getenv("REPLICATE_API_TOKEN")
+REDIS_URL = os.getenv("REDIS_URL")
+REPLICATE_WEBHOOK_URL = os.getenv("REPLICATE_WEBHOOK_URL")
+REPLICATE_WEBHOOK_SECRET = os.getenv("REPLICATE_WEBHOOK_SECRET")
+
+MUSICGEN_MODEL = "meta/musicgen:671ac645ce5e552cc63a54a2bbff63fcf798043055d2dac5fc9e36a837eedcfb"
+
+MAX_IMAGE_BYTES = int(os.getenv("MAX_IMAGE_BYTES", 20 * 1024 * 1024))
+UPLOAD_READ_CHUNK = 1 << 20
+# Image formats the OpenAI vision input accepts; anything else would fail upstream.
+OPENAI_IMAGE_TYPES = frozenset({"image/png", "image/jpeg", "image/gif", "image/webp"})
+# Multiple of 3 so each slice base64-encodes without padding and the pieces concatenate.
+BASE64_SLICE = 3 << 18
+
+OPENAI_CONCURRENCY = int(os.getenv("OPENAI_CONCURRENCY", 16))
+REPLICATE_CONCURRENCY = int(os.getenv("REPLICATE_CONCURRENCY", 8))
+
+DESCRIPTION_CACHE_TTL = 86400
+# Replicate file URLs expire after about an hour, so don't cache them longer.
+MUSIC_CACHE_TTL = 3000
+
+# Constant parts of the OpenAI request, built once instead of per call.
+_DEVELOPER_MESSAGE = {
+    "role": "developer",
+    "content": [
+        {
+            "type": "text",
+            "text": "I want you to be an intermediary to a music generative model. So, you will take an image and create a description based on the image to create a musical query to send to a gen music model. I want you to account for the vibe, genre, colors, and feeling of the picture. Describe the image from a musical perspective. What kind of music or sound does it evoke? Think about mood, rhythm, instrumentation, genre, etc. Max 2 sentences. Return only the description, no other text."
+        },
+    ]
+}
+_RESPONSE_FORMAT = {"type": "text"}
+
+# Keep upstream connections alive (HTTP/2, large pool) so calls skip the TCP+TLS handshake.
+_UPSTREAM_LIMITS = httpx.Limits(max_connections=50, max_keepalive_connections=50, keepalive_expiry=120)
 
 try:
-    openai_client = OpenAI()
+    # Retries are handled by _retry_transient so they respect the concurrency cap.
+    openai_client = AsyncOpenAI(
+        max_retries=0,
+        http_client=openai.DefaultAsyncHttpxClient(
+            http2=True, limits=_UPSTREAM_LIMITS, timeout=openai.Timeout(60, connect=5)
+        ),
+    )
     if not OPENAI_API_KEY:
-        print("Warning: OPENAI_API_KEY environment variable not set.")
+        log.warning("OPENAI_API_KEY environment variable not set.")
 except Exception as e:
-    print(f"Failed to initialize OpenAI client: {e}")
+    log.error("Failed to initialize OpenAI client: %s", e)
     openai_client = None
 
 if not REPLICATE_API_TOKEN:
-    print("Warning: REPLICATE_API_TOKEN environment variable not set.")
+    log.warning("REPLICATE_API_TOKEN environment variable not set.")
+
+class _PooledReplicateClient(replicate.Client):
+    """replicate.Client whose async httpx client uses a pooled HTTP/2 transport.
+
+    Client kwargs are shared by the sync and async httpx clients, so the async
+    transport is supplied here only; the sync client keeps its default transport.
+    This relies on replicate internals (_build_httpx_client and the client's
+    private attributes), so replicate is pinned in requirements.txt and
+    tests/test_replicate_client.py checks the client still builds.
+    """
+
+    @functools.cached_property
+    def _async_client(self) -> httpx.AsyncClient:
+        return _build_httpx_client(
+            httpx.AsyncClient,
+            self._api_token,
+            self._base_url,
+            self._timeout,
+            transport=httpx.AsyncHTTPTransport(http2=True, limits=_UPSTREAM_LIMITS),
+            **self._client_kwargs,
+        )
+
+
+replicate_client = _PooledReplicateClient(api_token=REPLICATE_API_TOKEN)
+
+
+# These caps are per process: with N workers the service-wide limit is N times the
+# configured value, so size OPENAI_CONCURRENCY/REPLICATE_CONCURRENCY accordingly.
+_openai_semaphore = asyncio.Semaphore(OPENAI_CONCURRENCY)
+_replicate_semaphore = asyncio.Semaphore(REPLICATE_CONCURRENCY)
+# Job creation gets its own slots so it never queues behind blocking /generate-audio runs.
+_replicate_job_semaphore = asyncio.Semaphore(REPLICATE_CONCURRENCY)
+
+
+def _is_transient_error(exc: BaseException) -> bool:
+    """Returns True for upstream failures that are worth retrying."""
+    if isinstance(exc, (httpx.TransportError, openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)):
+        return True
+    return isinstance(exc, replicate.exceptions.ReplicateError) and exc.status in (429, 500, 502, 503, 504)
+
+
+def _is_unsent_error(exc: BaseException) -> bool:
+    """Returns True for failures where the request provably never created anything upstream."""
+    if isinstance(exc, (httpx.ConnectError, httpx.ConnectTimeout)):
+        return True
+    return isinstance(exc, replicate.exceptions.ReplicateError) and exc.status == 429
+
+
+_retry_transient = tenacity.retry(
+    retry=tenacity.retry_if_exception(_is_transient_error),
+    wait=tenacity.wait_exponential_jitter(initial=1, max=30),
+    stop=tenacity.stop_after_attempt(4),
+    reraise=True,
+)
+
+# For non-idempotent creates: a retried timeout could start a second, billed prediction.
+_retry_unsent = tenacity.retry(
+    retry=tenacity.retry_if_exception(_is_unsent_error),
+    wait=tenacity.wait_exponential_jitter(initial=1, max=30),
+    stop=tenacity.stop_after_attempt(4),
+    reraise=True,
+)
+
+
+@_retry_transient
+async def _create_chat_completion(**kwargs):
+    async with _openai_semaphore:
+        return await openai_client.chat.completions.create(**kwargs)
+
+
+@_retry_unsent
+async def _start_replicate_prediction(model_identifier: str, replicate_input: dict):
+    # Prefer: wait lets short predictions finish within the create call itself.
+    return await replicate_client.predictions.async_create(
+        version=model_identifier.split(":", 1)[1], input=replicate_input, wait=True
+    )
+
+
+@_retry_transient
+async def _wait_for_prediction(prediction) -> None:
+    # Polling only reloads the existing prediction, so it is safe to retry.
+    await prediction.async_wait()
+
+
+async def _run_replicate(model_identifier: str, replicate_input: dict):
+    """Runs a prediction to completion and returns its output.
+
+    Only the create step is retried on errors that prove nothing was created;
+    transient errors while polling retry the poll, never the prediction.
+    """
+    async with _replicate_semaphore:
+        prediction = await _start_replicate_prediction(model_identifier, replicate_input)
+        await _wait_for_prediction(prediction)
+    if prediction.status != "succeeded":
+        raise replicate.exceptions.ModelError(prediction)
+    return prediction.output
+
+
+_http: httpx.AsyncClient | None = None
+
+
+async def init_http_client() -> None:
+    """Creates the shared HTTP client used for outbound downloads."""
+    global _http
+    _http = httpx.AsyncClient(
+        http2=True,
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+        timeout=30.0,
+    )
+
+
+async def close_http_client() -> None:
+    """Closes the shared HTTP client and its pooled connections."""
+    global _http
+    if _http is not None:
+        await _http.aclose()
+        _http = None
+
+
+redis_client: redis.Redis | None = None
+
+
+async def warm_up_upstream_clients() -> None:
+    """Opens pooled connections to OpenAI and Replicate so the first real request skips the handshake."""
+    async def _warm(name, call):
+        try:
+            await asyncio.wait_for(call(), timeout=5)
+        except Exception as e:
+            log.warning("Failed to warm up %s connection: %s", name, e)
+
+    warm_ups = []
+    if openai_client and OPENAI_API_KEY:
+        warm_ups.append(_warm("OpenAI", openai_client.models.list))
+    if REPLICATE_API_TOKEN:
+        warm_ups.append(_warm("Replicate", replicate_client.accounts.async_current))
+    await asyncio.gather(*warm_ups)
+
+
+async def close_upstream_clients() -> None:
+    """Closes the pooled OpenAI and Replicate connections opened by warm-up and requests."""
+    if openai_client is not None:
+        await openai_client.close()
+    # _async_client is a cached_property; only close it if it was ever built.
+    async_client = replicate_client.__dict__.pop("_async_client", None)
+    if async_client is not None:
+        await async_client.aclose()
+
+
+async def init_redis_client() -> None:
+    """Creates the Redis client used for response caching, if configured."""
+    global redis_client
+    if REDIS_URL:
+        redis_client = redis.Redis.from_url(REDIS_URL, decode_responses=True)
+    else:
+        log.warning("REDIS_URL environment variable not set. Caching disabled.")
+
+
+async def close_redis_client() -> None:
+    """Closes the Redis client."""
+    global redis_client
+    if redis_client is not None:
+        await redis_client.aclose()
+        redis_client = None
+
+
+async def _cache_get(key: str) -> str | None:
+    """Returns the cached value for key, or None on a miss or Redis error."""
+    if redis_client is None:
+        return None
+    try:
+        return await redis_client.get(key)
+    except redis.RedisError as e:
+        log.warning("Redis GET failed for %s: %s", key, e)
+        return None
 
-def encode_image_to_base64(image_bytes: bytes) -> str:
-    """Encodes image bytes to a base64 string."""
-    return base64.b64encode(image_bytes).decode('utf-8')
+
+async def _cache_set(key: str, value: str, ttl: int) -> None:
+    """Stores value under key with a TTL; Redis errors are ignored."""
+    if redis_client is None:
+        return
+    try:
+        await redis_client.set(key, value, ex=ttl)
+    except redis.RedisError as e:
+        log.warning("Redis SET failed for %s: %s", key, e)
+
+
+async def read_image_upload(image: UploadFile, max_bytes: int = MAX_IMAGE_BYTES) -> tuple[bytearray, str]:
+    """Reads an image upload into memory and returns it with its sniffed MIME type.
+
+    The type comes from the file's magic bytes rather than the client-supplied
+    content type. Non-images are rejected with 400 and files over max_bytes
+    with 413.
+    """
+    too_large = HTTPException(status_code=413, detail=f"Image too large. Maximum size is {max_bytes} bytes.")
+    # The request body cap lives in backend.UploadSizeLimitMiddleware; this bounds the file part itself.
+    if image.size is not None and image.size > max_bytes:
+        raise too_large
+
+    buf = bytearray()
+    mime = None
+    while chunk := await image.read(UPLOAD_READ_CHUNK):
+        if len(buf) + len(chunk) > max_bytes:
+            raise too_large
+        buf.extend(chunk)
+        if mime is None:
+            kind = filetype.guess(bytes(buf[:512]))
+            if kind is None or kind.mime not in OPENAI_IMAGE_TYPES:
+                raise HTTPException(status_code=400, detail="Invalid file type. Please upload a PNG, JPEG, GIF or WebP image.")
+            mime = kind.mime
+    if mime is None:
+        raise HTTPException(status_code=400, detail="Invalid file type. Please upload a PNG, JPEG, GIF or WebP image.")
+    return buf, mime
+
+
+def _hash_image(image_bytes: bytes) -> str:
+    """Returns a content hash of the image used as its cache key."""
+    return hashlib.blake2b(image_bytes, digest_size=16).hexdigest()
+
+
+async def _build_data_url(image_bytes: bytes, content_type: str) -> str:
+    """Base64-encodes the image into a data URL, yielding to the event loop between slices.
+
+    b64encode holds the GIL, so a worker thread would not keep the loop responsive.
+    The encoded slices are written into one preallocated buffer; the final ASCII
+    decode is the only full-size copy made in a single step.
+    """
+    view = memoryview(image_bytes)
+    prefix = b"data:" + content_type.encode() + b";base64,"
+    buf = bytearray(len(prefix) + 4 * ((len(view) + 2) // 3))
+    buf[:len(prefix)] = prefix
+    pos = len(prefix)
+    for start in range(0, len(view), BASE64_SLICE):
+        encoded = base64.b64encode(view[start:start + BASE64_SLICE])
+        buf[pos:pos + len(encoded)] = encoded
+        pos += len(encoded)
+        await asyncio.sleep(0)
+    return buf.decode("ascii")
 
 
 async def get_musical_description_from_openai(image: UploadFile):
     """Sends image to OpenAI and returns a musical description."""
     if not openai_client:
         raise HTTPException(status_code=500, detail="OpenAI client not initialized. Check API key.")
-    if not image.content_type or not image.content_type.startswith("image/"):
-         raise HTTPException(status_code=400, detail="Invalid file type. Please upload an image.")
+
+    image_bytes, mime_type = await read_image_upload(image)
 
     try:
-        image_bytes = await image.read()
-        base64_image = encode_image_to_base64(image_bytes)
-        response = openai_client.chat.completions.create(
+        # blake2b releases the GIL for large inputs, so hashing can run off the loop.
+        cache_key = "desc:" + await asyncio.to_thread(_hash_image, image_bytes)
+        cached = await _cache_get(cache_key)
+        if cached:
+            return cached
+
+        data_url = await _build_data_url(image_bytes, mime_type)
+        response = await _create_chat_completion(
             model="o4-mini",
             messages=[
-                {
-                "role": "developer",
-                "content": [
-                    {
-                    "type": "text",
-                    "text": "I want you to be an intermediary to a music generative model. So, you will take an image and create a description based on the image to create a musical query to send to a gen music model. I want you to account for the vibe, genre, colors, and feeling of the picture. Describe the image from a musical perspective. What kind of music or sound does it evoke? Think about mood, rhythm, instrumentation, genre, etc. Max 2 sentences. Return only the description, no other text."
-                    },
-                ]
-                },
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:{image.content_type};base64,{base64_image}"
-                            }
-                        }
-                    ]
-                }
+                _DEVELOPER_MESSAGE,
+                {"role": "user", "content": [{"type": "image_url", "image_url": {"url": data_url}}]},
             ],
-            response_format={
-                "type": "text"
-            },
+            response_format=_RESPONSE_FORMAT,
             reasoning_effort="low",
             store=False
             )
         description = response.choices[0].message.content
         if not description:
              raise HTTPException(status_code=500, detail="OpenAI returned an empty description.")
+        await _cache_set(cache_key, description, DESCRIPTION_CACHE_TTL)
         return description
 
     except Exception as e:
-        print(f"Error processing image with OpenAI: {e}")
+        log.exception("Error processing image with OpenAI")
         raise HTTPException(status_code=500, detail=f"Failed to get musical description from OpenAI: {e}")
 
 
+def _musicgen_input(prompt: str) -> dict:
+    """Returns the MusicGen input for a prompt."""
+    return {
+        "top_k": 150,
+        "top_p": 0,
+        "prompt": prompt,
+        "duration": 8,
+        "temperature": 1,
+        "continuation": False,
+        "model_version": "stereo-large",
+        "output_format": "wav",
+        "continuation_start": 0,
+        "multi_band_diffusion": False,
+        "normalization_strategy": "loudness",
+        "classifier_free_guidance": 3
+    }
+
+
+def _music_cache_key(replicate_input: dict) -> str:
+    return "music:" + hashlib.blake2b(
+        f"{MUSICGEN_MODEL}|{json.dumps(replicate_input, sort_keys=True)}".encode(), digest_size=16
+    ).hexdigest()
+
+
+def _extract_audio_url(output) -> str | None:
+    """Returns the audio URL from a Replicate output, or None if there isn't one."""
+    if hasattr(output, 'url') and isinstance(getattr(output, 'url', None), str):
+        return output.url
+    if isinstance(output, str) and output.startswith("http"):
+        return output
+    return None
+
+
 async def generate_audio_from_replicate(prompt: str) -> str:
     """Generates audio from a prompt using Replicate and returns the audio URL."""
     if not REPLICATE_API_TOKEN:
          raise HTTPException(status_code=500, detail="Replicate API token not configured.")
 
-    model_identifier = "meta/musicgen:671ac645ce5e552cc63a54a2bbff63fcf798043055d2dac5fc9e36a837eedcfb"
+    replicate_input = _musicgen_input(prompt)
+    cache_key = _music_cache_key(replicate_input)
 
     try:
-        print(f"Running Replicate model {model_identifier} with input: {prompt}")
-        output = replicate.run(
-            model_identifier,
-            input={
-                "top_k": 150,
-                "top_p": 0,
-                "prompt": prompt,
-                "duration": 8,
-                "temperature": 1,
-                "continuation": False,
-                "model_version": "stereo-large",
-                "output_format": "wav",
-                "continuation_start": 0,
-                "multi_band_diffusion": False,
-                "normalization_strategy": "loudness",
-                "classifier_free_guidance": 3
-            }
-        )
-        print(f"Replicate output: {output, type(output)}")
+        cached = await _cache_get(cache_key)
+        if cached:
+            return cached
 
+        log.debug("Running Replicate model %s with input: %s", MUSICGEN_MODEL, prompt)
+        output = await _run_replicate(MUSICGEN_MODEL, replicate_input)
+        log.debug("Replicate output: %r", output)
 
         # Make sure output is a str url
-        audio_url = None
-        if hasattr(output, 'url') and isinstance(getattr(output, 'url', None), str):
-            audio_url = output.url
-        elif isinstance(output, str) and output.startswith("http"):
-            audio_url = output
+        audio_url = _extract_audio_url(output)
         if not audio_url:
-            print(f"Unexpected or missing audio URL in Replicate output: {output}")
+            log.error("Unexpected or missing audio URL in Replicate output: %r", output)
             # Be more specific about the error
             raise HTTPException(status_code=500, detail="Audio generation succeeded but failed to get a valid audio URL from the output.")
 
+        await _cache_set(cache_key, audio_url, MUSIC_CACHE_TTL)
         return audio_url # Return only the extracted URL string
 
     except replicate.exceptions.ReplicateError as e:
-         print(f"Replicate API error: {e}")
+         log.exception("Replicate API error")
          raise HTTPException(status_code=502, detail=f"Audio generation service error: {e}")
     except Exception as e:
-        print(f"Error during Replicate audio generation: {e}")
+        log.exception("Error during Replicate audio generation")
         raise HTTPException(status_code=500, detail=f"Failed to generate audio via Replicate: {e}")
 
+
+_webhook_secret: WebhookSigningSecret | None = None
+
+
+async def _get_webhook_secret() -> WebhookSigningSecret:
+    """Returns the webhook signing secret, fetching Replicate's default one if not configured."""
+    global _webhook_secret
+    if _webhook_secret is None:
+        if REPLICATE_WEBHOOK_SECRET:
+            _webhook_secret = WebhookSigningSecret(key=REPLICATE_WEBHOOK_SECRET)
+        else:
+            _webhook_secret = await replicate_client.webhooks.default.async_secret()
+    return _webhook_secret
+
+
+@_retry_unsent
+async def _create_replicate_prediction(replicate_input: dict):
+    async with _replicate_job_semaphore:
+        return await replicate_client.predictions.async_create(
+            version=MUSICGEN_MODEL.split(":", 1)[1],
+            input=replicate_input,
+            webhook=REPLICATE_WEBHOOK_URL,
+            webhook_events_filter=["completed"],
+        )
+
+
+async def _set_music_job(job_id: str, job: dict, only_if_new: bool = False) -> None:
+    await redis_client.set(f"job:{job_id}", json.dumps(job), ex=MUSIC_CACHE_TTL, nx=only_if_new)
+
+
+async def start_music_job(prompt: str) -> str:
+    """Starts a Replicate prediction that reports back via webhook and returns its job id.
+
+    A prompt whose audio URL is already cached gets an immediately succeeded job instead.
+    """
+    if not REPLICATE_API_TOKEN:
+         raise HTTPException(status_code=500, detail="Replicate API token not configured.")
+    if not REPLICATE_WEBHOOK_URL:
+        raise HTTPException(status_code=500, detail="Replicate webhook URL not configured.")
+    if redis_client is None:
+        raise HTTPException(status_code=500, detail="Redis not configured; music jobs are unavailable.")
+
+    replicate_input = _musicgen_input(prompt)
+    try:
+        cached = await _cache_get(_music_cache_key(replicate_input))
+        if cached:
+            job_id = f"cached-{uuid.uuid4().hex}"
+            await _set_music_job(job_id, {"status": "succeeded", "audio_url": cached})
+            return job_id
+
+        prediction = await _create_replicate_prediction(replicate_input)
+        # The webhook may land (on any worker) before this write; never overwrite its result.
+        await _set_music_job(prediction.id, {"status": "starting"}, only_if_new=True)
+        return prediction.id
+
+    except replicate.exceptions.ReplicateError as e:
+         log.exception("Replicate API error")
+         raise HTTPException(status_code=502, detail=f"Audio generation service error: {e}")
+    except Exception as e:
+        log.exception("Error starting Replicate music job")
+        raise HTTPException(status_code=500, detail=f"Failed to start audio generation via Replicate: {e}")
+
+
+async def complete_music_job(headers: dict, body: bytes) -> None:
+    """Verifies a Replicate webhook delivery and records the prediction result."""
+    if redis_client is None:
+        raise HTTPException(status_code=500, detail="Redis not configured; music jobs are unavailable.")
+
+    # Malformed headers surface as ValueError (bad timestamp) or binascii.Error
+    # (bad base64), not just WebhookValidationError, which is itself a ValueError.
+    try:
+        replicate.webhooks.validate(
+            headers=headers, body=body.decode(), secret=await _get_webhook_secret(), tolerance=300
+        )
+    except ValueError as e:
+        log.warning("Rejected Replicate webhook: %s", e)
+        raise HTTPException(status_code=401, detail="Invalid webhook signature.")
+
+    try:
+        prediction = json.loads(body)
+        if not isinstance(prediction, dict) or not isinstance(prediction.get("id"), str):
+            raise ValueError("payload is not a prediction object")
+    except ValueError as e:
+        log.warning("Rejected Replicate webhook payload: %s", e)
+        raise HTTPException(status_code=400, detail="Invalid webhook payload.")
+
+    log.debug("Replicate webhook for prediction %s: %s", prediction.get("id"), prediction.get("status"))
+    audio_url = _extract_audio_url(prediction.get("output"))
+    if prediction.get("status") == "succeeded" and audio_url:
+        job = {"status": "succeeded", "audio_url": audio_url}
+        if isinstance(prediction.get("input"), dict):
+            await _cache_set(_music_cache_key(prediction["input"]), audio_url, MUSIC_CACHE_TTL)
+    else:
+        job = {"status": "failed", "error": str(prediction.get("error") or "Audio generation produced no audio URL.")}
+    await _set_music_job(prediction["id"], job)
+
+
+async def get_music_job(job_id: str) -> dict:
+    """Returns the status of a music job, including the audio URL once it has succeeded."""
+    if redis_client is None:
+        raise HTTPException(status_code=500, detail="Redis not configured; music jobs are unavailable.")
+    job = await redis_client.get(f"job:{job_id}")
+    if job is None:
+        raise HTTPException(status_code=404, detail="Music job not found.")
+    return json.loads(job)
+
+
+async def stream_audio_from_url(audio_url: str) -> AsyncIterator[bytes]:
+    """Opens the audio URL and returns an async iterator over its bytes.
+
+    The upstream status is checked before returning so that errors surface as
+    HTTP errors instead of a truncated stream.
+    """
+    if _http is None:
+        raise HTTPException(status_code=500, detail="HTTP client not initialized.")
+
+    response = await _http.send(_http.build_request("GET", audio_url), stream=True)
+    if response.is_error:
+        await response.aclose()
+        raise HTTPException(status_code=502, detail=f"Failed to fetch generated audio: HTTP {response.status_code}")
+    return _iter_response_bytes(response)
+
+
+async def _iter_response_bytes(response: httpx.Response) -> AsyncIterator[bytes]:
+    try:
+        async for chunk in response.aiter_bytes(65536):
+            yield chunk
+    finally:
+        await response.aclose()
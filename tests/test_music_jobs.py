@@ -0,0 +1,166 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import time
+
+import fakeredis
+import httpx
+import pytest
+import replicate.prediction
+import tenacity
+from fastapi import HTTPException
+
+import services
+
+SIGNING_KEY = b"test-signing-key-0123456789"
+AUDIO_URL = "https://replicate.delivery/abc/out.wav"
+
+
+@pytest.fixture(autouse=True)
+def music_job_env(monkeypatch):
+    monkeypatch.setattr(services, "redis_client", fakeredis.FakeAsyncRedis(decode_responses=True))
+    monkeypatch.setattr(services, "REPLICATE_API_TOKEN", "r8_test")
+    monkeypatch.setattr(services, "REPLICATE_WEBHOOK_URL", "https://example.test/replicate-webhook")
+    monkeypatch.setattr(services, "REPLICATE_WEBHOOK_SECRET", "whsec_" + base64.b64encode(SIGNING_KEY).decode())
+    monkeypatch.setattr(services, "_webhook_secret", None)
+    monkeypatch.setattr(services._create_replicate_prediction.retry, "wait", tenacity.wait_none())
+
+
+def signed_headers(body: bytes, timestamp: str | None = None) -> dict:
+    timestamp = timestamp or str(int(time.time()))
+    signed = f"msg_1.{timestamp}.".encode() + body
+    signature = base64.b64encode(hmac.new(SIGNING_KEY, signed, hashlib.sha256).digest()).decode()
+    return {"webhook-id": "msg_1", "webhook-timestamp": timestamp, "webhook-signature": f"v1,{signature}"}
+
+
+def prediction_body(**fields) -> bytes:
+    prediction = {"id": "pred_1", "status": "succeeded", "output": AUDIO_URL, "input": services._musicgen_input("jazz")}
+    prediction.update(fields)
+    return json.dumps(prediction).encode()
+
+
+def fake_create(monkeypatch, *outcomes):
+    """Makes Replicate's prediction create return/raise each outcome in turn; returns the call list."""
+    calls = []
+
+    async def async_create(self, **kwargs):
+        calls.append(kwargs)
+        outcome = outcomes[len(calls) - 1]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    monkeypatch.setattr(replicate.prediction.Predictions, "async_create", async_create)
+    return calls
+
+
+class FakePrediction:
+    id = "pred_1"
+
+
+def test_webhook_with_valid_signature_marks_job_succeeded():
+    body = prediction_body()
+    asyncio.run(services.complete_music_job(signed_headers(body), body))
+
+    assert asyncio.run(services.get_music_job("pred_1")) == {"status": "succeeded", "audio_url": AUDIO_URL}
+    cache_key = services._music_cache_key(services._musicgen_input("jazz"))
+    assert asyncio.run(services.redis_client.get(cache_key)) == AUDIO_URL
+
+
+def test_webhook_for_failed_prediction_records_error():
+    body = prediction_body(status="failed", output=None, error="CUDA out of memory")
+    asyncio.run(services.complete_music_job(signed_headers(body), body))
+
+    assert asyncio.run(services.get_music_job("pred_1")) == {"status": "failed", "error": "CUDA out of memory"}
+
+
+@pytest.mark.parametrize(
+    "tamper",
+    [
+        lambda h: {**h, "webhook-signature": "v1," + base64.b64encode(b"x" * 32).decode()},
+        lambda h: {**h, "webhook-signature": "v1,not-base64!"},
+        lambda h: {**h, "webhook-timestamp": "yesterday"},
+        lambda h: {**h, "webhook-timestamp": str(int(time.time()) - 3600)},
+        lambda h: {k: v for k, v in h.items() if k != "webhook-signature"},
+    ],
+    ids=["wrong-signature", "malformed-signature", "non-numeric-timestamp", "stale-timestamp", "missing-signature"],
+)
+def test_webhook_with_bad_signature_is_rejected(tamper):
+    body = prediction_body()
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(services.complete_music_job(tamper(signed_headers(body)), body))
+
+    assert excinfo.value.status_code == 401
+    assert asyncio.run(services.redis_client.get("job:pred_1")) is None
+
+
+@pytest.mark.parametrize("body", [b"{not json", b"[]", b'{"status": "succeeded"}'])
+def test_webhook_with_malformed_payload_is_rejected(body):
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(services.complete_music_job(signed_headers(body), body))
+
+    assert excinfo.value.status_code == 400
+
+
+def test_start_music_job_records_starting(monkeypatch):
+    calls = fake_create(monkeypatch, FakePrediction())
+
+    assert asyncio.run(services.start_music_job("jazz")) == "pred_1"
+    assert asyncio.run(services.get_music_job("pred_1")) == {"status": "starting"}
+    assert calls[0]["webhook"] == services.REPLICATE_WEBHOOK_URL
+
+
+def test_start_music_job_does_not_overwrite_earlier_webhook_result(monkeypatch):
+    fake_create(monkeypatch, FakePrediction())
+    body = prediction_body()
+    asyncio.run(services.complete_music_job(signed_headers(body), body))
+
+    asyncio.run(services.start_music_job("jazz"))
+
+    assert asyncio.run(services.get_music_job("pred_1"))["status"] == "succeeded"
+
+
+def test_start_music_job_retries_create_on_connect_error(monkeypatch):
+    calls = fake_create(monkeypatch, httpx.ConnectError("refused"), FakePrediction())
+
+    assert asyncio.run(services.start_music_job("jazz")) == "pred_1"
+    assert len(calls) == 2
+
+
+def test_start_music_job_does_not_retry_create_on_read_timeout(monkeypatch):
+    calls = fake_create(monkeypatch, httpx.ReadTimeout("timed out"), FakePrediction())
+
+    with pytest.raises(HTTPException):
+        asyncio.run(services.start_music_job("jazz"))
+    assert len(calls) == 1
+
+
+def test_start_music_job_reuses_cached_audio_without_calling_replicate(monkeypatch):
+    calls = fake_create(monkeypatch)
+    cache_key = services._music_cache_key(services._musicgen_input("jazz"))
+    asyncio.run(services.redis_client.set(cache_key, AUDIO_URL))
+
+    job_id = asyncio.run(services.start_music_job("jazz"))
+
+    assert calls == []
+    assert asyncio.run(services.get_music_job(job_id)) == {"status": "succeeded", "audio_url": AUDIO_URL}
+
+
+def test_start_music_job_does_not_wait_for_blocking_generations(monkeypatch):
+    fake_create(monkeypatch, FakePrediction())
+    # Simulate every /generate-audio slot being held by a long create-and-poll run.
+    monkeypatch.setattr(services, "_replicate_semaphore", asyncio.Semaphore(0))
+
+    async def start():
+        return await asyncio.wait_for(services.start_music_job("jazz"), timeout=1)
+
+    assert asyncio.run(start()) == "pred_1"
+
+
+def test_get_unknown_music_job_is_404():
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(services.get_music_job("missing"))
+
+    assert excinfo.value.status_code == 404
@@ -0,0 +1,69 @@
+import asyncio
+import io
+
+import pytest
+from fastapi import HTTPException, UploadFile
+from starlette.datastructures import Headers
+
+import services
+
+PNG = b"\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR" + b"\x00" * 64
+JPEG = b"\xff\xd8\xff\xe0\x00\x10JFIF\x00" + b"\x00" * 64
+GIF = b"GIF89a" + b"\x00" * 64
+WEBP = b"RIFF\x00\x00\x00\x00WEBPVP8 " + b"\x00" * 64
+BMP = b"BM" + b"\x00" * 64
+TIFF = b"II*\x00" + b"\x00" * 64
+
+
+def upload(data: bytes, content_type: str = "image/png", size: int | None = None) -> UploadFile:
+    return UploadFile(
+        io.BytesIO(data),
+        size=len(data) if size is None else size,
+        filename="upload",
+        headers=Headers({"content-type": content_type}),
+    )
+
+
+def read(image: UploadFile, max_bytes: int = services.MAX_IMAGE_BYTES):
+    return asyncio.run(services.read_image_upload(image, max_bytes))
+
+
+@pytest.mark.parametrize(
+    ("data", "mime"),
+    [(PNG, "image/png"), (JPEG, "image/jpeg"), (GIF, "image/gif"), (WEBP, "image/webp")],
+)
+def test_supported_image_is_read_with_sniffed_type(data, mime):
+    buf, sniffed = read(upload(data, content_type="application/octet-stream"))
+
+    assert bytes(buf) == data
+    assert sniffed == mime
+
+
+@pytest.mark.parametrize("data", [b"hello, not an image" * 10, BMP, TIFF], ids=["text", "bmp", "tiff"])
+def test_spoofed_or_unsupported_type_is_rejected(data):
+    with pytest.raises(HTTPException) as excinfo:
+        read(upload(data, content_type="image/png"))
+
+    assert excinfo.value.status_code == 400
+
+
+def test_empty_file_is_rejected():
+    with pytest.raises(HTTPException) as excinfo:
+        read(upload(b""))
+
+    assert excinfo.value.status_code == 400
+
+
+def test_file_over_cap_is_rejected():
+    with pytest.raises(HTTPException) as excinfo:
+        read(upload(PNG + b"\x00" * 1024), max_bytes=512)
+
+    assert excinfo.value.status_code == 413
+
+
+def test_file_over_cap_is_rejected_while_reading(monkeypatch):
+    monkeypatch.setattr(services, "UPLOAD_READ_CHUNK", 256)
+    with pytest.raises(HTTPException) as excinfo:
+        read(upload(PNG + b"\x00" * 1024, size=0), max_bytes=512)
+
+    assert excinfo.value.status_code == 413
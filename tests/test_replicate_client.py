@@ -0,0 +1,39 @@
+import asyncio
+
+import httpx
+
+import services
+
+
+def test_async_client_uses_pooled_http2_transport():
+    client = services._PooledReplicateClient(api_token="r8_test")
+
+    async_client = client._async_client
+
+    assert isinstance(async_client, httpx.AsyncClient)
+    assert async_client is client._async_client
+    assert async_client.headers["Authorization"] == "Bearer r8_test"
+    assert str(async_client.base_url).startswith("https://api.replicate.com")
+    transport = async_client._transport._wrapped_transport
+    assert isinstance(transport, httpx.AsyncHTTPTransport)
+    assert transport._pool._http2
+    asyncio.run(async_client.aclose())
+
+
+def test_sync_client_keeps_default_transport():
+    client = services._PooledReplicateClient(api_token="r8_test")
+
+    assert isinstance(client._client._transport._wrapped_transport, httpx.HTTPTransport)
+    client._client.close()
+
+
+def test_close_upstream_clients_rebuilds_replicate_client_on_next_use(monkeypatch):
+    client = services._PooledReplicateClient(api_token="r8_test")
+    monkeypatch.setattr(services, "replicate_client", client)
+    monkeypatch.setattr(services, "openai_client", None)
+    first = client._async_client
+
+    asyncio.run(services.close_upstream_clients())
+
+    assert first.is_closed
+    assert client._async_client is not first
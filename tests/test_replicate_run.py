@@ -0,0 +1,92 @@
+import asyncio
+
+import httpx
+import pytest
+import replicate.exceptions
+import replicate.prediction
+import tenacity
+
+import services
+
+AUDIO_URL = "https://replicate.delivery/abc/out.wav"
+
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(services._start_replicate_prediction.retry, "wait", tenacity.wait_none())
+    monkeypatch.setattr(services._wait_for_prediction.retry, "wait", tenacity.wait_none())
+    monkeypatch.setattr(services.replicate_client, "poll_interval", 0)
+
+
+def make_prediction(status: str = "starting", output=None) -> replicate.prediction.Prediction:
+    return replicate.prediction._json_to_prediction(
+        services.replicate_client,
+        {"id": "pred_1", "model": "meta/musicgen", "version": "v", "status": status, "input": {}, "output": output},
+    )
+
+
+def fake_replicate(monkeypatch, creates, reloads):
+    """Fakes prediction create and reload with the given outcomes (a value to return or an exception to raise)."""
+    calls = {"create": 0, "reload": 0}
+
+    async def async_create(self, **kwargs):
+        outcome = creates[calls["create"]]
+        calls["create"] += 1
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    async def async_reload(self):
+        outcome = reloads[calls["reload"]]
+        calls["reload"] += 1
+        if isinstance(outcome, Exception):
+            raise outcome
+        self.status, self.output, self.error = outcome
+
+    monkeypatch.setattr(replicate.prediction.Predictions, "async_create", async_create)
+    monkeypatch.setattr(replicate.prediction.Prediction, "async_reload", async_reload)
+    return calls
+
+
+def run():
+    return asyncio.run(services._run_replicate(services.MUSICGEN_MODEL, services._musicgen_input("jazz")))
+
+
+def test_polls_until_succeeded(monkeypatch):
+    calls = fake_replicate(monkeypatch, [make_prediction()], [("processing", None, None), ("succeeded", AUDIO_URL, None)])
+
+    assert run() == AUDIO_URL
+    assert calls == {"create": 1, "reload": 2}
+
+
+def test_read_timeout_on_create_is_not_retried(monkeypatch):
+    calls = fake_replicate(monkeypatch, [httpx.ReadTimeout("timed out"), make_prediction()], [])
+
+    with pytest.raises(httpx.ReadTimeout):
+        run()
+    assert calls["create"] == 1
+
+
+def test_connect_error_on_create_is_retried(monkeypatch):
+    calls = fake_replicate(monkeypatch, [httpx.ConnectError("refused"), make_prediction("succeeded", AUDIO_URL)], [])
+
+    assert run() == AUDIO_URL
+    assert calls["create"] == 2
+
+
+def test_transient_poll_error_retries_only_the_poll(monkeypatch):
+    calls = fake_replicate(
+        monkeypatch,
+        [make_prediction()],
+        [httpx.ReadError("reset"), replicate.exceptions.ReplicateError(status=503), ("succeeded", AUDIO_URL, None)],
+    )
+
+    assert run() == AUDIO_URL
+    assert calls == {"create": 1, "reload": 3}
+
+
+def test_failed_prediction_raises_model_error(monkeypatch):
+    fake_replicate(monkeypatch, [make_prediction()], [("failed", None, "CUDA out of memory")])
+
+    with pytest.raises(replicate.exceptions.ModelError):
+        run()
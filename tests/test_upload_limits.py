@@ -0,0 +1,51 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import backend
+import services
+
+PNG = b"\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR" + b"\x00" * 64
+
+
+@pytest.fixture
+def client(monkeypatch):
+    async def describe(image):
+        # Reaching the service means the request got past the size limit.
+        return "ok"
+
+    monkeypatch.setattr(backend, "get_musical_description_from_openai", describe)
+    # No context manager: the lifespan (logging, Redis, upstream warm-up) is not needed here.
+    return TestClient(backend.app)
+
+
+def test_request_over_declared_content_length_is_rejected_before_parsing(client):
+    body = b"x" * (services.MAX_IMAGE_BYTES + 128 * 1024)
+    response = client.post(
+        "/describe-image-musically",
+        content=body,
+        headers={"Content-Type": "multipart/form-data; boundary=b", "Content-Length": str(len(body))},
+    )
+
+    assert response.status_code == 413
+
+
+def test_streamed_request_without_content_length_is_cut_off(client):
+    def chunks():
+        yield b'--b\r\nContent-Disposition: form-data; name="image"; filename="a.png"\r\n'
+        yield b"Content-Type: image/png\r\n\r\n" + PNG
+        for _ in range(services.MAX_IMAGE_BYTES // (1 << 20) + 2):
+            yield b"x" * (1 << 20)
+        yield b"\r\n--b--\r\n"
+
+    response = client.post(
+        "/describe-image-musically", content=chunks(), headers={"Content-Type": "multipart/form-data; boundary=b"}
+    )
+
+    assert response.status_code == 413
+
+
+def test_request_under_limit_reaches_endpoint(client):
+    response = client.post("/describe-image-musically", files={"image": ("a.png", PNG, "image/png")})
+
+    assert response.status_code == 200
+    assert response.json() == {"description": "ok"}